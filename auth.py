@@ -6,17 +6,23 @@ import datetime
 import getpass
 import hashlib
 import json
+import orjson
 import random
 import re
+import requests_wrapper
 import sys
-import urllib
 
 from os.path import expanduser
+from urllib.parse import unquote
 from requests_wrapper import requests_wrapper as requests
 
 # Allowed alphabet for generating salts
 ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ+/"
 
+# Matches [protocol://]url[:port][/] in a single pass
+URL_PATTERN = re.compile(r"^(?:(https?)://)?([^:/]+)(?::(\d+))?/?$",
+                         re.IGNORECASE)
+
 
 # Login by authenticating against the Duplicati API and extracting a token
 def login(data, input_url=None, password=None, verify=True,
@@ -25,29 +31,21 @@ def login(data, input_url=None, password=None, verify=True,
         input_url = ""
 
     # Split protocol, url, and port
-    input_url = input_url.replace("/", "").replace("_", "")
-    count = input_url.count(":")
-    protocol = ""
-    url = ""
-    port = ""
-    if count == 2:
-        protocol, url, port = input_url.split(":")
-    elif count == 1 and input_url.index(":") < 6:
-        protocol, url = input_url.split(":")
-    elif count == 1:
-        url, port = input_url.split(":")
-    elif count == 0:
-        url = input_url
-    else:
-        common.log_output("Invalid URL", True)
-        sys.exit(2)
-
-    # Strip nondigits
-    port = ''.join(re.findall(r'\d+', port))
+    protocol = None
+    url = None
+    port = None
+    if input_url != "":
+        match = URL_PATTERN.match(input_url.strip())
+        if match is None:
+            common.log_output("Invalid URL", True)
+            sys.exit(2)
+        protocol, url, port = match.group(1, 2, 3)
 
     # Default to config file values for any missing parameters
-    if protocol is None or protocol.lower() not in ["http", "https"]:
+    if protocol is None:
         protocol = data["server"]["protocol"]
+    else:
+        protocol = protocol.lower()
     if url is None or url == "":
         url = data["server"]["url"]
     if port is None or port == "":
@@ -58,9 +56,12 @@ def login(data, input_url=None, password=None, verify=True,
     data["server"]["url"] = url
     data["server"]["port"] = port
 
+    # Start from a clean session so stale tokens aren't sent along
+    requests_wrapper.set_auth({}, {}, verify)
+
     # Make the login attempt
     baseurl = common.create_baseurl(data, "")
-    common.log_output("Connecting to " + baseurl + "...", False)
+    common.log_output(f"Connecting to {baseurl}...", False)
     r = requests.get(baseurl, allow_redirects=True, verify=verify)
     common.check_response(data, r.status_code)
 
@@ -93,7 +94,7 @@ def login(data, input_url=None, password=None, verify=True,
         # Create the basic auth secret
         secret = base64.b64encode((basic_user+":"+basic_pass).encode('ascii'))
         # Create the authorization string
-        basic_auth = "Basic " + secret.decode('utf-8')
+        basic_auth = f"Basic {secret.decode('utf-8')}"
         headers = {"Authorization": basic_auth}
         r = requests.get(baseurl, verify=verify, headers=headers,
                          allow_redirects=True)
@@ -108,7 +109,7 @@ def login(data, input_url=None, password=None, verify=True,
 
     if r.status_code == 200 and not login_redirect:
         common.log_output("OK", False, r.status_code)
-        token = urllib.parse.unquote(r.cookies["xsrf-token"])
+        token = unquote(r.cookies["xsrf-token"])
     elif r.status_code == 200 and login_redirect:
         password = prompt_password(password, interactive)
 
@@ -116,6 +117,7 @@ def login(data, input_url=None, password=None, verify=True,
         baseurl = common.create_baseurl(data, "/login.cgi")
         headers = common.create_headers(data)
         payload = {'get-nonce': 1}
+        requests_wrapper.clear_cookies()
         r = requests.post(baseurl, headers=headers, data=payload,
                           verify=verify)
         if r.status_code != 200:
@@ -123,14 +125,14 @@ def login(data, input_url=None, password=None, verify=True,
                               r.status_code)
             sys.exit(2)
 
-        salt = r.json()["Salt"]
-        data["nonce"] = urllib.parse.unquote(r.json()["Nonce"])
-        token = urllib.parse.unquote(r.cookies["xsrf-token"])
+        body = orjson.loads(r.content)
+        salt = body["Salt"]
+        data["nonce"] = unquote(body["Nonce"])
+        token = unquote(r.cookies["xsrf-token"])
         common.log_output("Hashing password...", False)
-        salt_password = password.encode() + base64.b64decode(salt)
-        saltedpwd = hashlib.sha256(salt_password).digest()
-        nonce_password = base64.b64decode(data["nonce"]) + saltedpwd
-        noncedpwd = hashlib.sha256(nonce_password).digest()
+        saltedpwd = hash_password(password, salt)
+        nonce = base64.b64decode(data["nonce"])
+        noncedpwd = hashlib.sha256(nonce + saltedpwd).digest()
 
         common.log_output("Authenticating... ", False)
         payload = {
@@ -140,13 +142,13 @@ def login(data, input_url=None, password=None, verify=True,
             "xsrf-token": token,
             "session-nonce": data.get("nonce", "")
         }
+        requests_wrapper.clear_cookies()
         r = requests.post(baseurl, headers=headers, data=payload,
                           cookies=cookies, verify=verify)
         common.check_response(data, r.status_code)
         if r.status_code == 200:
             common.log_output("Connected", False, r.status_code)
-            data["session-auth"] = urllib.parse.unquote(
-                                        r.cookies["session-auth"])
+            data["session-auth"] = unquote(r.cookies["session-auth"])
         else:
             message = "Error authenticating against the server"
             common.log_output(message, True, r.status_code)
@@ -162,6 +164,7 @@ def login(data, input_url=None, password=None, verify=True,
     data["token_expires"] = expiration
     data["last_login"] = datetime.datetime.now()
     common.write_config(data)
+    common.set_session_auth(data)
     common.log_output("Login successful", True)
     return data
 
@@ -184,9 +187,6 @@ def set_password(data, password=None, disable_login=False, interactive=True):
 
     common.log_output("Setting server password...", False)
     baseurl = common.create_baseurl(data, "/api/v1/serversettings")
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
 
     if disable_login:
         password = None
@@ -197,8 +197,7 @@ def set_password(data, password=None, disable_login=False, interactive=True):
         # Generate a salt
         salt = ''.join(random.choice(ALPHABET) for i in range(44))
         # Hash the password and salt
-        salt_password = password.encode() + base64.b64decode(salt)
-        hashed_password = hashlib.sha256(salt_password).digest()
+        hashed_password = hash_password(password, salt)
         hashed_password = base64.b64encode(hashed_password).decode('utf-8')
 
     payload = json.dumps({
@@ -207,8 +206,7 @@ def set_password(data, password=None, disable_login=False, interactive=True):
         'has-asked-for-password-protection': 'true'
     })
 
-    r = requests.patch(baseurl, headers=headers, cookies=cookies,
-                       data=payload, verify=verify)
+    r = requests.patch(baseurl, data=payload)
     common.check_response(data, r.status_code)
     if r.status_code != 200:
         message = "Error updating password settings"
@@ -230,6 +228,11 @@ def determine_ssl_validation(data, certfile=None, insecure=False):
     return data["server"]["verify"]
 
 
+# Hash a password with a base64 encoded salt the same way the server does
+def hash_password(password, salt):
+    return hashlib.sha256(password.encode() + base64.b64decode(salt)).digest()
+
+
 # Get password by prompting user if no password was given in-line
 def prompt_password(password, interactive):
     if password is None and interactive:
@@ -1,32 +1,39 @@
 # Module for common functions used across multiple modules and functions
+import atexit
 import auth
 import config
 import datetime
+import helper
 import io
+import orjson
 import sys
 import os.path
-import urllib
-import yaml
+import requests_wrapper
+import urllib.parse
 import compatibility
 
-from dateutil import tz
+# Token expiration as last written to the config file
+persisted_expiration = None
+
+# Config whose refreshed token expiration still has to be written
+pending_config = None
+
+# Config file path and serialized contents of the last write
+last_config_write = None
+
+
+# Config fields that must be present besides "server", and under "server"
+REQUIRED_FIELDS = ("token", "token_expires")
+REQUIRED_SERVER_FIELDS = ("protocol", "url", "port")
 
 
 # Common function for validating that required config fields are present
 def validate_config(data):
-    valid = True
-    if "server" not in data:
-        valid = False
-    if "protocol" not in data.get("server", {}):
-        valid = False
-    if "url" not in data.get("server", {}):
-        valid = False
-    if "port" not in data.get("server", {}):
-        valid = False
-    if "token" not in data:
-        valid = False
-    if "token_expires" not in data:
-        valid = False
+    # Stop at the first missing field, and only look up the server once
+    server = data.get("server", None)
+    valid = bool(server) and \
+        all(field in data for field in REQUIRED_FIELDS) and \
+        all(field in server for field in REQUIRED_SERVER_FIELDS)
 
     if not valid:
         message = "Configuration appears to be invalid. "
@@ -37,13 +44,64 @@ def validate_config(data):
 
 # Common function for writing config to file
 def write_config(data):
-    directory = os.path.dirname(config.CONFIG_FILE)
-    if not os.path.exists(directory):
-        message = "Created directory \"" + directory + "\""
+    global persisted_expiration, pending_config, last_config_write
+    persisted_expiration = data.get("token_expires", None)
+    pending_config = None
+
+    # Skip the write if the file already holds exactly this config
+    options = orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE
+    content = orjson.dumps(data, default=str, option=options)
+    payload = (config.CONFIG_FILE, content)
+    if payload == last_config_write:
+        return
+
+    # Write a private temporary file and move it over the config, so a
+    # crash mid-write never leaves a truncated config behind
+    # Only create the directory if opening the file shows it's missing
+    temporary_file = config.CONFIG_FILE + ".tmp"
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    try:
+        fd = os.open(temporary_file, flags, 0o600)
+    except FileNotFoundError:
+        directory = os.path.dirname(config.CONFIG_FILE)
+        os.makedirs(directory, exist_ok=True)
+        message = f"Created directory \"{directory}\""
         log_output(message, True)
-        os.makedirs(directory)
-    with io.open(config.CONFIG_FILE, 'w', encoding="UTF-8") as file:
-        file.write(yaml.safe_dump(data, default_flow_style=False, allow_unicode=True))
+        fd = os.open(temporary_file, flags, 0o600)
+    try:
+        written = 0
+        while written < len(content):
+            written += os.write(fd, content[written:])
+    finally:
+        os.close(fd)
+    os.replace(temporary_file, config.CONFIG_FILE)
+    last_config_write = payload
+
+
+# Common function for writing a deferred config update before exiting
+@atexit.register
+def flush_config():
+    if pending_config is not None:
+        write_config(pending_config)
+
+
+# Common function for locating the YAML config file of older versions
+def get_legacy_config_location():
+    return os.path.splitext(config.CONFIG_FILE)[0] + ".yml"
+
+
+# Common function for reading config from file
+def read_config():
+    with io.open(config.CONFIG_FILE, 'rb') as file:
+        data = orjson.loads(file.read())
+
+    # JSON has no datetime type, so restore the timestamps
+    # Stored times are naive, so drop any offset from hand edited values
+    for key in ["last_login", "token_expires"]:
+        if isinstance(data.get(key, None), str):
+            timestamp = helper.parse_time(data[key])
+            data[key] = timestamp.replace(tzinfo=None)
+    return data
 
 
 # Common function for getting parameters from file
@@ -53,16 +111,17 @@ def load_parameters(data, args):
     if file is None:
         return args
 
-    # Don't load nonexisting files
-    if os.path.isfile(file) is False:
+    # Load the parameters from the file, skipping nonexisting files
+    try:
+        file_handle = io.open(file, 'rb')
+    except FileNotFoundError:
         return args
-
-    # Load the parameters from the file
-    with io.open(file, 'r', encoding="UTF-8") as file_handle:
+    import yaml
+    with file_handle:
         try:
-            parameters_file = yaml.safe_load(file_handle)
+            parameters_file = load_yaml(file_handle.read())
             parameters = len(parameters_file)
-            message = "Loaded " + str(parameters) + " parameters from file"
+            message = f"Loaded {parameters} parameters from file"
             log_output(message, True)
 
             for key, value in parameters_file.items():
@@ -71,15 +130,16 @@ def load_parameters(data, args):
                     args[key] = value
 
             # Verbose is special because verbose is a command not an argument
-            if parameters_file.get("verbose", None) is not None:
-                data["verbose"] = parameters_file.get("verbose")
-
-            if parameters_file.get("precise", None) is not None:
-                data["precise"] = parameters_file.get("precise")
-
-            # Update parameters_file variable in config file
-            data["parameters_file"] = file
-            write_config(data)
+            changed = False
+            for key in ["verbose", "precise"]:
+                value = parameters_file.get(key, None)
+                if value is not None and data.get(key, None) != value:
+                    data[key] = value
+                    changed = True
+
+            # Only rewrite the config file if the parameters changed it
+            if changed:
+                write_config(data)
             return args
         except yaml.YAMLError as exc:
             log_output(exc, True)
@@ -95,7 +155,44 @@ def log_output(text, important, code=None):
         print(text)
         return
 
-    print(text + "\nCode: " + str(code))
+    print(f"{text}\nCode: {code}")
+
+
+# Common function for logging messages when verbose mode is off
+# It replaces log_output once verbosity is known, skipping its checks
+def log_important_output(text, important, code=None):
+    if important:
+        print(text)
+
+
+# Common function for parsing YAML
+# PyYAML is imported on first use, preferring the libyaml backed loader
+def load_yaml(stream):
+    import yaml
+    try:
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+# Common function for serializing to YAML
+# Keys keep their order instead of being sorted on every dump
+def dump_yaml(data, stream=None, encoding=None):
+    import yaml
+    try:
+        from yaml import CSafeDumper as SafeDumper
+    except ImportError:
+        from yaml import SafeDumper
+    return yaml.dump(data, stream, Dumper=SafeDumper, default_flow_style=False,
+                     allow_unicode=True, sort_keys=False, encoding=encoding)
+
+
+# Common function for serializing resources for display
+def dump_output(data):
+    if config.OUTPUT_FORMAT == "yaml":
+        return dump_yaml(data)
+    return orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2).decode()
 
 
 # Common function for creating cookies to authenticate against the API
@@ -131,26 +228,34 @@ def create_headers(data):
     return headers
 
 
+# Common function for authenticating all calls on the shared HTTP session
+def set_session_auth(data):
+    headers = create_headers(data) or {}
+    verify = data.get("server", {}).get("verify", True)
+    requests_wrapper.set_auth(headers, create_cookies(data), verify)
+
+
 # Common function for creating a base url
 def create_baseurl(data, additional_path="", append_token=False):
-    protocol = data["server"]["protocol"]
-    url = data["server"]["url"]
-    if protocol == "https" and data["server"]["port"] == "":
+    server = data["server"]
+    protocol = server["protocol"]
+    port = server["port"]
+    if port == "" and protocol == "https":
         port = "443"
-    elif protocol == "http" and data["server"]["port"] == "":
+    elif port == "" and protocol == "http":
         port = "8200"
-    else:
-        port = data["server"]["port"]
-    baseurl = protocol + "://" + url + ":" + port + additional_path
+    baseurl = f"{protocol}://{server['url']}:{port}{additional_path}"
     if append_token is True:
-        baseurl += "?x-xsrf-token="
-        baseurl += urllib.parse.quote_plus(data.get("token", ''))
+        token = urllib.parse.quote_plus(data.get("token", ''))
+        baseurl += f"?x-xsrf-token={token}"
 
     return baseurl
 
 
 # Common function for checking API responses for session expiration
 def check_response(data, status_code):
+    global pending_config
+
     # Exit if session expired
     if status_code == 400:
         message = "The server refused the request, "
@@ -184,10 +289,15 @@ def check_response(data, status_code):
         sys.exit(2)
 
     # Refresh token duration if request is OK
+    # Small refreshes are written once on exit instead of on every request
     if status_code == 200:
         expiration = datetime.datetime.now() + datetime.timedelta(0, 600)
         data["token_expires"] = expiration
-        write_config(data)
+        if persisted_expiration is None or \
+                (expiration - persisted_expiration).total_seconds() > 60:
+            write_config(data)
+        else:
+            pending_config = data
 
 
 # Common function for verifying token validity
@@ -198,14 +308,9 @@ def verify_token(data):
         log_output("Not logged in", True)
         sys.exit(2)
 
-    # Get time
-    now = datetime.datetime.now()
-
-    # Take care of timezones
-    now = now.replace(tzinfo=tz.tzutc())
-    now = now.astimezone(tz.tzlocal())
-    expires = expires.replace(tzinfo=tz.tzutc())
-    expires = expires.astimezone(tz.tzlocal())
+    # Get time, both sides are taken to be in the same timezone
+    now = datetime.datetime.now().replace(tzinfo=helper.UTC)
+    expires = expires.replace(tzinfo=helper.UTC)
 
     # Check if token is still valid
     if now < expires:
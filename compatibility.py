@@ -1,25 +1,31 @@
 # Module for handling compatibility issues between OS'es and Python versions
-import platform
+import functools
 import os
+import sys
 
 from os.path import expanduser
 
+# Decided once, sys.platform is set at startup unlike platform.system()
+IS_WINDOWS = sys.platform == "win32"
+
 
 # Use the correct directory for each OS
+# The location can't change while running, so it is only looked up once
+@functools.lru_cache(maxsize=1)
 def get_config_location():
     home = expanduser("~")
-    if platform.system() == 'Windows':
+    if IS_WINDOWS:
         config_dir = "/AppData/Local/DuplicatiClient/"
     else:
         config_dir = "/.config/duplicati-client/"
 
-    config_file = home + config_dir + "config.yml"
+    config_file = home + config_dir + "config.json"
     return config_file
 
 
 # Clear terminal prompt
 def clear_prompt():
-    if platform.system() == 'Windows':
+    if IS_WINDOWS:
         os.system('cls')
     else:
         os.system('clear')
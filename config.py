@@ -1,4 +1,5 @@
 # Config module for holding information shared between modules
 APPLICATION_VERSION = "0.5.7"
-CONFIG_FILE = "config.yml"
+CONFIG_FILE = "config.json"
 VERBOSE = False
+OUTPUT_FORMAT = "json"
@@ -2,25 +2,27 @@
 import arg_parser as ArgumentParser
 import config
 import io
-import json
+import orjson
 import os.path
 import sys
 import datetime
 import time
-import yaml
 import compatibility
 import common
 import auth
 import helper
+import requests_wrapper
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from os.path import expanduser
 from os.path import splitext
 from requests_wrapper import requests_wrapper as requests
 
 
 def main(**args):
-    # Command method
-    method = sys.argv[1]
+    # Command method, global options may come before it on the command line
+    method = args.get("method", None)
 
     if method == "version":
         message = "Duplicati client version "
@@ -51,6 +53,16 @@ def main(**args):
     overwrite = args.get("overwrite", False)
     data = load_config(data, overwrite)
 
+    # Authenticate API calls with the stored session, login makes a new one
+    if method != "login":
+        common.set_session_auth(data)
+
+    # Share recent server responses between invocations unless disabled
+    # The cache is still located when disabled so that changes can clear it
+    cache_dir = os.path.join(os.path.dirname(config.CONFIG_FILE), "cache")
+    requests_wrapper.cache_directory = cache_dir
+    requests_wrapper.use_cache = not args.get("no_cache", False)
+
     param_file = args.get("param-file", None)
     # Set parameters file
     if method == "params":
@@ -75,155 +87,215 @@ def main(**args):
 
     # Write verbosity setting to config variable
     config.VERBOSE = data.get("verbose", False)
+    if config.VERBOSE is False:
+        common.log_output = common.log_important_output
+
+    # Write output format setting to config variable
+    output_format = args.get("output", None)
+    if output_format is not None:
+        config.OUTPUT_FORMAT = output_format.lower()
+
+    # Run the requested command
+    command = COMMANDS.get(method, None)
+    if command is not None:
+        command(data, args)
+
+
+# Display the config
+def command_config(data, args):
+    display_config(data)
+
+
+# Display the status
+def command_status(data, args):
+    display_status(data)
+
+
+# Login
+def command_login(data, args):
+    url = args.get("url", None)
+    password = args.get("password", None)
+    basic_user = args.get("basic_user", None)
+    basic_pass = args.get("basic_pass", None)
+    certfile = args.get("certfile", None)
+    insecure = args.get("insecure", False)
+    verify = auth.determine_ssl_validation(data, certfile, insecure)
+    interactive = args.get("script", True)
+    auth.login(data, url, password, verify, interactive,
+               basic_user, basic_pass)
+
 
-    # Display the config if requested
-    if method == "config":
-        display_config(data)
+# Logout
+def command_logout(data, args):
+    auth.logout(data)
 
-    # Display the status if requested
-    if method == "status":
-        display_status(data)
 
-    # Login
-    if method == "login":
-        url = args.get("url", None)
+# List resources
+def command_list(data, args):
+    resource_type = args.get("type", None)
+    list_resources(data, resource_type)
+
+
+# Get resources
+def command_get(data, args):
+    resource_type = args.get("type", None)
+    resource_ids = args.get("id", None)
+    get_resources(data, resource_type, resource_ids)
+
+
+# Describe resources
+def command_describe(data, args):
+    resource_type = args.get("type", None)
+    resource_ids = args.get("id", None)
+    describe_resources(data, resource_type, resource_ids)
+
+
+# Set resource values
+def command_set(data, args):
+    resource = args.get("resource", None)
+    if resource == "password":
         password = args.get("password", None)
-        basic_user = args.get("basic_user", None)
-        basic_pass = args.get("basic_pass", None)
-        certfile = args.get("certfile", None)
-        insecure = args.get("insecure", False)
-        verify = auth.determine_ssl_validation(data, certfile, insecure)
+        disable_login = args.get("disable", False)
         interactive = args.get("script", True)
-        data = auth.login(data, url, password, verify, interactive,
-                          basic_user, basic_pass)
+        auth.set_password(data, password, disable_login, interactive)
 
-    # Logout
-    if method == "logout":
-        data = auth.logout(data)
 
-    # List resources
-    if method == "list":
-        resource_type = args.get("type", None)
-        list_resources(data, resource_type)
+# Repair a database
+def command_repair(data, args):
+    backup_id = args.get("id", None)
+    repair_database(data, backup_id)
 
-    # Get resources
-    if method == "get":
-        resource_type = args.get("type", None)
-        resource_ids = args.get("id", None)
-        get_resources(data, resource_type, resource_ids)
-
-    # Describe resources
-    if method == "describe":
-        resource_type = args.get("type", None)
-        resource_ids = args.get("id", None)
-        describe_resources(data, resource_type, resource_ids)
-
-    # Set resource values
-    if method == "set":
-        resource = sys.argv[2]
-        if resource == "password":
-            password = args.get("password", None)
-            disable_login = args.get("disable", False)
-            interactive = args.get("script", True)
-            auth.set_password(data, password, disable_login, interactive)
-
-    # Repair a database
-    if method == "repair":
-        backup_id = args.get("id", None)
-        repair_database(data, backup_id)
 
-    # Vacuum a database
-    if method == "vacuum":
-        backup_id = args.get("id", None)
-        vacuum_database(data, backup_id)
-
-    # Verify remote data files
-    if method == "verify":
-        backup_id = args.get("id", None)
-        verify_remote_files(data, backup_id)
-
-    # Compact remote data
-    if method == "compact":
-        backup_id = args.get("id", None)
-        compact_remote_files(data, backup_id)
-
-    # Dismiss notifications
-    if method == "dismiss":
-        resource_id = args.get("id", "all")
-        if not resource_id.isdigit() and resource_id != "all":
-            common.log_output("Invalid id: " + resource_id, True)
-            return
-        dismiss_notifications(data, resource_id)
-
-    # Show logs
-    if method == "logs":
-        log_type = args.get("type", None)
-        backup_id = args.get("id", None)
-        remote = args.get("remote", False)
-        follow = args.get("follow", False)
-        lines = args.get("lines", 10)
-        show_all = args.get("all", False)
-        get_logs(data, log_type, backup_id, remote, follow, lines, show_all)
-
-    # Run backup
-    if method == "run":
-        backup_id = args.get("id", None)
-        run_backup(data, backup_id)
-
-    # Abort backup
-    if method == "abort":
-        backup_id = args.get("id", None)
-        abort_task(data, backup_id)
-
-    # Create method
-    if method == "create":
-        import_type = args.get("type", None)
-        import_file = args.get("import-file", None)
-        import_meta = args.get("import_metadata", None)
-
-        import_resource(data, import_type, import_file, None, import_meta)
-
-    # Update method
-    if method == "update":
-        import_type = args.get("type", None)
-        import_id = args.get("id", None)
-        import_file = args.get("import-file", None)
-        # import-metadata is the inverse of strip-metadata
-        import_meta = not args.get("strip_metadata", False)
-
-        import_resource(data, import_type, import_file, import_id, import_meta)
-
-    # Delete a resource
-    if method == "delete":
-        resource_id = args.get("id", None)
-        resource_type = args.get("type", None)
-        delete_db = args.get("delete_db", False)
-        confirm = args.get("confirm", False)
-        recreate = args.get("recreate", False)
-        delete_resource(data, resource_type, resource_id,
-                        confirm, delete_db, recreate)
-
-    # Export method
-    if method == "export":
-        resource_id = args.get("id", None)
-        output_type = args.get("output", None)
-        path = args.get("output_path", None)
-        export_passwords = args.get("no_passwords", True)
-        all_ids = args.get("all", False)
-        timestamp = args.get("timestamp", False)
-        print(export_passwords)
-        export_backup(data, resource_id, output_type, path,
-                      export_passwords, all_ids, timestamp)
-
-
-    # Pause
-    if method == "pause":
-        time = args.get("duration", "xxx")
-        pause(data, time)
-    
-    # Resume
-    if method == "resume":
-        resume(data)
+# Vacuum a database
+def command_vacuum(data, args):
+    backup_id = args.get("id", None)
+    vacuum_database(data, backup_id)
+
+
+# Verify remote data files
+def command_verify(data, args):
+    backup_id = args.get("id", None)
+    verify_remote_files(data, backup_id)
+
+
+# Compact remote data
+def command_compact(data, args):
+    backup_id = args.get("id", None)
+    compact_remote_files(data, backup_id)
+
+
+# Dismiss notifications
+def command_dismiss(data, args):
+    resource_id = args.get("id", "all")
+    if not resource_id.isdigit() and resource_id != "all":
+        common.log_output(f"Invalid id: {resource_id}", True)
+        return
+    dismiss_notifications(data, resource_id)
+
+
+# Show logs
+def command_logs(data, args):
+    log_type = args.get("type", None)
+    backup_id = args.get("id", None)
+    remote = args.get("remote", False)
+    follow = args.get("follow", False)
+    lines = args.get("lines", 10)
+    show_all = args.get("all", False)
+    get_logs(data, log_type, backup_id, remote, follow, lines, show_all)
+
+
+# Run backup
+def command_run(data, args):
+    backup_id = args.get("id", None)
+    run_backup(data, backup_id)
+
+
+# Abort backup
+def command_abort(data, args):
+    backup_id = args.get("id", None)
+    abort_task(data, backup_id)
+
+
+# Create method
+def command_create(data, args):
+    import_type = args.get("type", None)
+    import_file = args.get("import-file", None)
+    import_meta = args.get("import_metadata", None)
+
+    import_resource(data, import_type, import_file, None, import_meta)
+
+
+# Update method
+def command_update(data, args):
+    import_type = args.get("type", None)
+    import_id = args.get("id", None)
+    import_file = args.get("import-file", None)
+    # import-metadata is the inverse of strip-metadata
+    import_meta = not args.get("strip_metadata", False)
+
+    import_resource(data, import_type, import_file, import_id, import_meta)
+
+
+# Delete a resource
+def command_delete(data, args):
+    resource_id = args.get("id", None)
+    resource_type = args.get("type", None)
+    delete_db = args.get("delete_db", False)
+    confirm = args.get("confirm", False)
+    recreate = args.get("recreate", False)
+    delete_resource(data, resource_type, resource_id,
+                    confirm, delete_db, recreate)
+
+
+# Export method
+def command_export(data, args):
+    resource_id = args.get("id", None)
+    output_type = args.get("output", None)
+    path = args.get("output_path", None)
+    export_passwords = args.get("no_passwords", True)
+    all_ids = args.get("all", False)
+    timestamp = args.get("timestamp", False)
+    export_backup(data, resource_id, output_type, path,
+                  export_passwords, all_ids, timestamp)
+
+
+# Pause
+def command_pause(data, args):
+    duration = args.get("duration", "xxx")
+    pause(data, duration)
+
+
+# Resume
+def command_resume(data, args):
+    resume(data)
+
+
+# Commands that are dispatched after the config and parameters are loaded
+COMMANDS = {
+    "config": command_config,
+    "status": command_status,
+    "login": command_login,
+    "logout": command_logout,
+    "list": command_list,
+    "get": command_get,
+    "describe": command_describe,
+    "set": command_set,
+    "repair": command_repair,
+    "vacuum": command_vacuum,
+    "verify": command_verify,
+    "compact": command_compact,
+    "dismiss": command_dismiss,
+    "logs": command_logs,
+    "run": command_run,
+    "abort": command_abort,
+    "create": command_create,
+    "update": command_update,
+    "delete": command_delete,
+    "export": command_export,
+    "pause": command_pause,
+    "resume": command_resume,
+}
+
 
 # Function for display a list of resources
 def list_resources(data, resource):
@@ -242,7 +314,7 @@ def list_resources(data, resource):
         common.log_output("No items found", True)
         sys.exit(2)
 
-    message = yaml.safe_dump(resource_list, default_flow_style=False, allow_unicode=True)
+    message = common.dump_output(resource_list)
     common.log_output(message, True, 200)
 
 
@@ -289,12 +361,8 @@ def validate_database_exists(data, db_path):
 
     # api/v1/filesystem/validate
     baseurl = common.create_baseurl(data, "/api/v1/filesystem/validate")
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
     payload = {'path': db_path}
-    verify = data.get("server", {}).get("verify", True)
-    r = requests.post(baseurl, headers=headers, params=payload,
-                      cookies=cookies, verify=verify)
+    r = requests.post(baseurl, params=payload)
     common.check_response(data, r.status_code)
     if r.status_code != 200:
         return False
@@ -303,12 +371,9 @@ def validate_database_exists(data, db_path):
 
 # Fetch all resources of a certain type
 def fetch_resource_list(data, resource):
-    baseurl = common.create_baseurl(data, "/api/v1/" + resource)
-    common.log_output("Fetching " + resource + " list from API...", False)
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
-    r = requests.get(baseurl, headers=headers, cookies=cookies, verify=verify)
+    baseurl = common.create_baseurl(data, f"/api/v1/{resource}")
+    common.log_output(f"Fetching {resource} list from API...", False)
+    r = requests.get(baseurl, cache_seconds=5)
     common.check_response(data, r.status_code)
     if r.status_code == 404:
         common.log_output("No entries found", True, r.status_code)
@@ -317,7 +382,7 @@ def fetch_resource_list(data, resource):
         common.log_output("Error connecting", True, r.status_code)
         sys.exit(2)
     else:
-        return r.json()
+        return orjson.loads(r.content)
 
 
 # Filter logic for the list function to facilitate readable output
@@ -325,36 +390,34 @@ def list_filter(data, json_input, resource):
     resource_list = []
     if resource == "backups":
         for key in json_input:
-            backup = key.get("Backup", None)
+            backup = key.get("Backup", {})
             schedule = key.get("Schedule", None)
             progress_state = key.get("Progress", None)
-            backup_name = backup.get("Name", "")
-            backup = {
-                backup_name: {
-                    "ID": backup.get("ID", ""),
-                }
+            # Build the entry directly instead of indexing by name each time
+            entry = {
+                "ID": backup.get("ID", ""),
             }
 
-            if backup.get('Metadata', {}).get('SourceSizeString') is not None:
-                size = backup.get('Metadata', {}).get('SourceSizeString')
-                backup[backup_name]["Source size"] = size
+            size = backup.get("Metadata", {}).get("SourceSizeString", None)
+            if size is not None:
+                entry["Source size"] = size
 
             if schedule is not None:
                 next_run = helper.format_time(data, schedule.get("Time", ""))
                 if next_run is not None:
-                    backup[backup_name]["Next run"] = next_run
+                    entry["Next run"] = next_run
 
                 last_run = helper.format_time(data, schedule.get("LastRun", ""))
                 if last_run is not None:
-                    backup[backup_name]["Last run"] = last_run
+                    entry["Last run"] = last_run
 
             if progress_state is not None:
-                backup[backup_name]["Running"] = {
+                entry["Running"] = {
                     "Task ID": progress_state.get("TaskID", None),
                     "State": progress_state.get("Phase", None),
                 }
 
-            resource_list.append(backup)
+            resource_list.append({backup.get("Name", ""): entry})
 
     elif resource == "notifications":
         for val in json_input:
@@ -371,20 +434,20 @@ def list_filter(data, json_input, resource):
             resource_list.append(notification)
 
     elif resource == "serversettings":
+        hidden_values = {
+            "update-check-latest",
+            "last-update-check",
+            "is-first-run",
+            "update-check-interval",
+            "server-passphrase",
+            "server-passphrase-salt",
+            "server-passphrase-trayicon",
+            "server-passphrase-trayicon-hash",
+            "unacked-error",
+            "unacked-warning",
+            "has-fixed-invalid-backup-id",
+        }
         for key, value in json_input.items():
-            hidden_values = [
-                "update-check-latest",
-                "last-update-check",
-                "is-first-run",
-                "update-check-interval",
-                "server-passphrase",
-                "server-passphrase-salt",
-                "server-passphrase-trayicon",
-                "server-passphrase-trayicon-hash",
-                "unacked-error",
-                "unacked-warning",
-                "has-fixed-invalid-backup-id",
-            ]
             if key in hidden_values:
                 continue
             setting = {
@@ -407,7 +470,7 @@ def get_resources(data, resource_type, resource_ids):
     elif resource_type == "notification":
         result = fetch_notifications(data, resource_ids, "get")
 
-    message = yaml.safe_dump(result, default_flow_style=False, allow_unicode=True)
+    message = common.dump_output(result)
     common.log_output(message, True, 200)
 
 
@@ -418,7 +481,7 @@ def describe_resources(data, resource_type, resource_ids):
     elif resource_type == "notification":
         result = fetch_notifications(data, resource_ids, "describe")
 
-    message = yaml.safe_dump(result, default_flow_style=False, allow_unicode=True)
+    message = common.dump_output(result)
     common.log_output(message, True, 200)
 
 
@@ -428,18 +491,17 @@ def fetch_notifications(data, notification_ids, method):
 
     common.log_output("Fetching notifications from API...", False)
     baseurl = common.create_baseurl(data, "/api/v1/notifications")
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
+    # Drop duplicate ID's while keeping the order they were given in
+    notification_ids = dict.fromkeys(notification_ids)
     notification_list = []
-    r = requests.get(baseurl, headers=headers, cookies=cookies, verify=verify)
+    r = requests.get(baseurl, cache_seconds=5)
     common.check_response(data, r.status_code)
     if r.status_code != 200:
-        id_list = ', '.join(notification_ids)
-        message = "Error getting notifications " + id_list
+        id_list = ', '.join(str(i) for i in notification_ids)
+        message = f"Error getting notifications {id_list}"
         common.log_output(message, True, r.status_code)
     else:
-        data = r.json()
+        data = orjson.loads(r.content)
 
     for notification in data:
         notification_id = notification.get("ID", -1)
@@ -484,19 +546,22 @@ def fetch_backups(data, backup_ids, method):
     progress = progress_state.get("OverallProgress", 1)
     backup_list = []
     baseurl = common.create_baseurl(data, "/api/v1/backup/")
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
-    # Iterate over backup_ids and fetch their info
-    for backup_id in backup_ids:
-        r = requests.get(baseurl + str(backup_id), headers=headers,
-                         cookies=cookies, verify=verify)
+    # Drop duplicate ID's so each backup is only fetched once
+    backup_ids = list(dict.fromkeys(str(i) for i in backup_ids))
+    # Fetch the backups in parallel since the calls are independent
+    fetch_backup = partial(requests.get, cache_seconds=5)
+    urls = [baseurl + backup_id for backup_id in backup_ids]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(fetch_backup, urls))
+
+    # Iterate over the responses in the order the backup_ids were given
+    for backup_id, r in zip(backup_ids, responses):
         common.check_response(data, r.status_code)
         if r.status_code != 200:
-            message = "Error getting backup " + str(backup_id)
+            message = f"Error getting backup {backup_id}"
             common.log_output(message, True, r.status_code)
             continue
-        backup = r.json()["data"]
+        backup = orjson.loads(r.content)["data"]
 
         item_id = backup.get("Backup", {}).get("ID", 0)
         if active_id is not None and item_id == active_id and progress != 1:
@@ -516,14 +581,11 @@ def fetch_backups(data, backup_ids, method):
 
 def fetch_server_state(data):
     baseurl = common.create_baseurl(data, "/api/v1/serverstate")
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
-    r = requests.get(baseurl, headers=headers, cookies=cookies, verify=verify)
+    r = requests.get(baseurl)
     if r.status_code != 200:
         server_state = {}
     else:
-        server_state = r.json()
+        server_state = orjson.loads(r.content)
 
     return server_state
 
@@ -531,16 +593,13 @@ def fetch_server_state(data):
 # Fetch backup progress state
 def fetch_progress_state(data):
     baseurl = common.create_baseurl(data, "/api/v1/progressstate")
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
     # Check progress state and get info for the running backup
-    r = requests.get(baseurl, headers=headers, cookies=cookies, verify=verify)
+    r = requests.get(baseurl)
     if r.status_code != 200:
         active_id = -1
         progress_state = {}
     else:
-        progress_state = r.json()
+        progress_state = orjson.loads(r.content)
         active_id = progress_state.get("BackupID", -1)
 
     # Don't show progress on finished tasks
@@ -603,7 +662,7 @@ def backup_filter(data, json_input):
                 "Task ID": progress_state.get("TaskID", -1),
             }
             if speed > 0:
-                readable_speed = helper.format_bytes(speed) + "/s"
+                readable_speed = f"{helper.format_bytes(speed)}/s"
                 progress["Backend"]["Speed"] = readable_speed
 
             # Display item only if relevant
@@ -614,27 +673,26 @@ def backup_filter(data, json_input):
             total_file_count = progress_state.get("TotalFileCount", 0)
             processing = state == "Backup_ProcessingFiles"
             if file_count > 0 and total_file_count > 0 and processing:
-                processed = "{0:.2f}".format(file_count /
-                                             total_file_count * 100)
-                progress["Processed files"] = processed + "%"
+                processed = file_count / total_file_count * 100
+                progress["Processed files"] = f"{processed:.2f}%"
             # Avoid 0 division
             data_size = progress_state.get("ProcessedFileSize", 0)
             total_data_size = progress_state.get("TotalFileSize", 0)
             processing = state == "Backup_ProcessingFiles"
             if data_size > 0 and total_data_size > 0 and processing:
                 # Calculate percentage
-                processed = "{0:.2f}".format(data_size / total_data_size * 100)
+                processed = data_size / total_data_size * 100
                 # Format text "x% (y GB of z GB)"
-                processed += "% (" + str(helper.format_bytes(data_size))
-                processed += " of "
-                processed += str(helper.format_bytes(total_data_size)) + ")"
-                progress["Processed data"] = processed
+                size = helper.format_bytes(data_size)
+                total_size = helper.format_bytes(total_data_size)
+                progress["Processed data"] = (f"{processed:.2f}% "
+                                              f"({size} of {total_size})")
             # Avoid 0 division
             current = progress_state.get("BackendFileProgress", 0)
             total = progress_state.get("BackendFileSize", 0)
             if current > 0 and total > 0:
-                backend_progress = "{0:.2f}".format(current / total * 100)
-                progress["Backend"]["Progress"] = backend_progress + "%"
+                backend_progress = current / total * 100
+                progress["Backend"]["Progress"] = f"{backend_progress:.2f}%"
             backup["Progress"] = progress
 
         key = {
@@ -698,15 +756,11 @@ def get_logs(data, log_type, backup_id, remote=False,
 
 # Get local and remote backup logs
 def get_backup_logs(data, backup_id, log_type, page_size=5, show_all=False):
-    endpoint = "/api/v1/backup/" + str(backup_id) + "/" + log_type
+    endpoint = f"/api/v1/backup/{backup_id}/{log_type}"
     baseurl = common.create_baseurl(data, endpoint)
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
     params = {'pagesize': page_size}
 
-    r = requests.get(baseurl, headers=headers, cookies=cookies, params=params,
-                     verify=verify)
+    r = requests.get(baseurl, params=params)
     common.check_response(data, r.status_code)
     if r.status_code == 500:
         message = "Error getting log, "
@@ -717,51 +771,39 @@ def get_backup_logs(data, backup_id, log_type, page_size=5, show_all=False):
         common.log_output("Error getting log", True, r.status_code)
         return
 
-    result = r.json()[-page_size:]
+    result = orjson.loads(r.content)
+    # The server honors pagesize, so only trim if it sent more than asked
+    if len(result) > page_size:
+        result = result[-page_size:]
     logs = []
     for log in result:
         if log.get("Operation", "") == "list":
             log["Data"] = "Expunged"
         else:
-            log["Data"] = json.loads(log.get("Data", "{}"))
+            log["Data"] = orjson.loads(log.get("Data") or "{}")
             size = helper.format_bytes(log["Data"].get("Size", 0))
             log["Data"]["Size"] = size
 
         if log.get("Message", None) is not None:
-            log["Message"] = log["Message"].split("\n")
-            message_length = len(log["Message"])
-            if message_length > 15 and not show_all:
-                log["Message"] = log["Message"][:15]
-                lines = str(message_length - 15)
-                hidden_message = lines + " hidden lines (show with --all)"
-                log["Message"].append(hidden_message)
+            log["Message"] = helper.limit_lines(log["Message"], 15, show_all)
         if log.get("Exception", None) is not None:
-            log["Exception"] = log["Exception"].split("\n")
-            exception_length = len(log["Exception"])
-            if exception_length > 15 and not show_all:
-                log["Exception"] = log["Exception"][:15]
-                lines = str(exception_length - 15)
-                hidden_message = lines + " hidden lines (show with --all)"
-                log["Exception"].append(hidden_message)
+            log["Exception"] = helper.limit_lines(log["Exception"], 15,
+                                                  show_all)
 
         log["Timestamp"] = datetime.datetime.fromtimestamp(
             int(log.get("Timestamp", 0))
         ).strftime("%I:%M:%S %p %d/%m/%Y")
         logs.append(log)
-    message = yaml.safe_dump(logs, default_flow_style=False, allow_unicode=True)
+    message = common.dump_output(logs)
     common.log_output(message, True)
 
 
 # Get live logs
 def get_live_logs(data, level, page_size=5, first_id=0):
     baseurl = common.create_baseurl(data, "/api/v1/logdata/poll")
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
     params = {'level': level, 'id': first_id, 'pagesize': page_size}
 
-    r = requests.get(baseurl, headers=headers, cookies=cookies, params=params,
-                     verify=verify)
+    r = requests.get(baseurl, params=params)
     common.check_response(data, r.status_code)
     if r.status_code == 500:
         message = "Error getting log, "
@@ -772,7 +814,10 @@ def get_live_logs(data, level, page_size=5, first_id=0):
         common.log_output("Error getting log", True, r.status_code)
         return
 
-    result = r.json()[-page_size:]
+    result = orjson.loads(r.content)
+    # The server honors pagesize, so only trim if it sent more than asked
+    if len(result) > page_size:
+        result = result[-page_size:]
     logs = []
     for log in result:
         log["When"] = helper.format_time(data, log.get("When", ""))
@@ -782,20 +827,16 @@ def get_live_logs(data, level, page_size=5, first_id=0):
         common.log_output("No log entries found", True)
         return
 
-    message = yaml.safe_dump(logs, default_flow_style=False, allow_unicode=True)
+    message = common.dump_output(logs)
     common.log_output(message, True)
 
 
 # Get stored logs
 def get_stored_logs(data, page_size=5, show_all=False):
     baseurl = common.create_baseurl(data, "/api/v1/logdata/log")
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
     params = {'pagesize': page_size}
 
-    r = requests.get(baseurl, headers=headers, cookies=cookies, params=params,
-                     verify=verify)
+    r = requests.get(baseurl, params=params)
     common.check_response(data, r.status_code)
     if r.status_code == 500:
         message = "Error getting log, "
@@ -806,32 +847,24 @@ def get_stored_logs(data, page_size=5, show_all=False):
         common.log_output("Error getting log", True, r.status_code)
         return
 
-    result = r.json()[-page_size:]
+    result = orjson.loads(r.content)
+    # The server honors pagesize, so only trim if it sent more than asked
+    if len(result) > page_size:
+        result = result[-page_size:]
     logs = []
     for log in result:
         if log.get("Message", None) is not None:
-            log["Message"] = log["Message"].split("\n")
-            message_length = len(log["Message"])
-            if message_length > 15 and not show_all:
-                log["Message"] = log["Message"][:15]
-                lines = str(message_length - 15)
-                hidden_message = lines + " hidden lines (show with --all)"
-                log["Message"].append(hidden_message)
+            log["Message"] = helper.limit_lines(log["Message"], 15, show_all)
         if log.get("Exception", None) is not None:
-            log["Exception"] = log["Exception"].split("\n")
-            exception_length = len(log["Exception"])
-            if exception_length > 15 and not show_all:
-                log["Exception"] = log["Exception"][:15]
-                lines = str(exception_length - 15)
-                hidden_message = lines + " hidden lines (show with --all)"
-                log["Exception"].append(hidden_message)
+            log["Exception"] = helper.limit_lines(log["Exception"], 15,
+                                                  show_all)
         logs.append(log)
 
     if len(logs) == 0:
         common.log_output("No log entries found", True)
         return
 
-    message = yaml.safe_dump(logs, default_flow_style=False, allow_unicode=True)
+    message = common.dump_output(logs)
     common.log_output(message, True)
 
 
@@ -853,12 +886,9 @@ def follow_function(data, function, interval=5):
 def run_backup(data, backup_id):
     common.verify_token(data)
 
-    path = "/api/v1/backup/" + str(backup_id) + "/run"
+    path = f"/api/v1/backup/{backup_id}/run"
     baseurl = common.create_baseurl(data, path)
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
-    r = requests.post(baseurl, headers=headers, cookies=cookies, verify=verify)
+    r = requests.post(baseurl)
     common.check_response(data, r.status_code)
     if r.status_code != 200:
         common.log_output("Error scheduling backup ", True, r.status_code)
@@ -870,12 +900,9 @@ def run_backup(data, backup_id):
 def abort_task(data, task_id):
     common.verify_token(data)
 
-    path = "/api/v1/task/" + str(task_id) + "/abort"
+    path = f"/api/v1/task/{task_id}/abort"
     baseurl = common.create_baseurl(data, path)
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
-    r = requests.post(baseurl, headers=headers, cookies=cookies, verify=verify)
+    r = requests.post(baseurl)
     common.check_response(data, r.status_code)
     if r.status_code != 200:
         common.log_output("Error aborting task ", True, r.status_code)
@@ -913,15 +940,11 @@ def delete_backup(data, backup_id, confirm=False, delete_db=False):
             common.log_output("Backup not deleted", True)
             return
 
-    baseurl = common.create_baseurl(data, "/api/v1/backup/" + str(backup_id))
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
+    baseurl = common.create_baseurl(data, f"/api/v1/backup/{backup_id}")
     # We cannot delete remote files because the captcha is graphical
     payload = {'delete-local-db': delete_db, 'delete-remote-files': False}
 
-    r = requests.delete(baseurl, headers=headers, cookies=cookies,
-                        params=payload, verify=verify)
+    r = requests.delete(baseurl, params=payload)
     common.check_response(data, r.status_code)
     if r.status_code != 200:
         common.log_output("Error deleting backup", True, r.status_code)
@@ -949,14 +972,10 @@ def delete_database(data, backup_id, confirm=False, recreate=False):
             common.log_output("Database not deleted", True)
             return
 
-    baseurl = common.create_baseurl(data, "/api/v1/backup/" +
-                                    str(backup_id) + "/deletedb")
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
+    baseurl = common.create_baseurl(data,
+                                    f"/api/v1/backup/{backup_id}/deletedb")
 
-    r = requests.post(baseurl, headers=headers, cookies=cookies,
-                      verify=verify)
+    r = requests.post(baseurl)
     common.check_response(data, r.status_code)
     if r.status_code != 200:
         common.log_output("Error deleting database", True, r.status_code)
@@ -968,7 +987,7 @@ def delete_database(data, backup_id, confirm=False, recreate=False):
 
 # Repair the database
 def repair_database(data, backup_id):
-    url = "/api/v1/backup/" + backup_id + "/repair"
+    url = f"/api/v1/backup/{backup_id}/repair"
     fail_message = "Failed to initialize database repair"
     success_message = "Initialized database repair"
     call_backup_subcommand(data, url, fail_message, success_message)
@@ -976,7 +995,7 @@ def repair_database(data, backup_id):
 
 # Vacuum the database
 def vacuum_database(data, backup_id):
-    url = "/api/v1/backup/" + backup_id + "/vacuum"
+    url = f"/api/v1/backup/{backup_id}/vacuum"
     fail_message = "Failed to initialize database vacuum"
     success_message = "Initialized database vacuum"
     call_backup_subcommand(data, url, fail_message, success_message)
@@ -984,7 +1003,7 @@ def vacuum_database(data, backup_id):
 
 # Verify the remote data files
 def verify_remote_files(data, backup_id):
-    url = "/api/v1/backup/" + backup_id + "/verify"
+    url = f"/api/v1/backup/{backup_id}/verify"
     fail_message = "Failed to initialize remote file verification"
     success_message = "Initialized remote file verification"
     call_backup_subcommand(data, url, fail_message, success_message)
@@ -992,7 +1011,7 @@ def verify_remote_files(data, backup_id):
 
 # Compact the remote data files
 def compact_remote_files(data, backup_id):
-    url = "/api/v1/backup/" + backup_id + "/compact"
+    url = f"/api/v1/backup/{backup_id}/compact"
     fail_message = "Failed to initialize remote data compaction"
     success_message = "Initialized remote file compaction"
     call_backup_subcommand(data, url, fail_message, success_message)
@@ -1004,11 +1023,7 @@ def call_backup_subcommand(data, url, fail_message, success_message):
     common.verify_token(data)
 
     baseurl = common.create_baseurl(data, url)
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
-    r = requests.post(baseurl, headers=headers, cookies=cookies,
-                      verify=verify)
+    r = requests.post(baseurl)
     common.check_response(data, r.status_code)
     if r.status_code != 200:
         common.log_output(fail_message, True, r.status_code)
@@ -1022,11 +1037,7 @@ def delete_notification(data, notification_id):
 
     url = "/api/v1/notification/"
     baseurl = common.create_baseurl(data, url + str(notification_id))
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
-    r = requests.delete(baseurl, headers=headers, cookies=cookies,
-                        verify=verify)
+    r = requests.delete(baseurl)
     common.check_response(data, r.status_code)
     if r.status_code == 404:
         common.log_output("Notification not found", True, r.status_code)
@@ -1044,13 +1055,11 @@ def update_backup(data, backup_id, backup_config, import_meta=True):
     if import_meta is not None and not import_meta:
         backup_config.get("Backup", {}).pop("Metadata", None)
 
-    baseurl = common.create_baseurl(data, "/api/v1/backup/" + str(backup_id))
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
-    payload = json.dumps(backup_config, default=str)
-    r = requests.put(baseurl, headers=headers, cookies=cookies,
-                     data=payload, verify=verify)
+    baseurl = common.create_baseurl(data, f"/api/v1/backup/{backup_id}")
+    # YAML files may have non-string keys, which json.dumps used to convert
+    payload = orjson.dumps(backup_config, default=str,
+                           option=orjson.OPT_NON_STR_KEYS)
+    r = requests.put(baseurl, data=payload)
     common.check_response(data, r.status_code)
     if r.status_code == 404:
         common.log_output("Backup not found", True, r.status_code)
@@ -1072,7 +1081,7 @@ def toggle_verbose(data, mode=None):
 
     common.write_config(data)
     verbose = data.get("verbose", True)
-    message = "verbose mode: " + str(verbose)
+    message = f"verbose mode: {verbose}"
     common.log_output(message, True)
     return data
 
@@ -1088,37 +1097,37 @@ def toggle_precise(data, mode=None):
 
     common.write_config(data)
     precise = data.get("precise", True)
-    message = "precise mode: " + str(precise)
+    message = f"precise mode: {precise}"
     common.log_output(message, True)
     return data
 
 
 # Print the status to stdout
 def display_status(data):
-    message = "Server       : " + common.create_baseurl(data)
+    message = f"Server       : {common.create_baseurl(data)}"
     common.log_output(message, True)
 
     server_state = fetch_server_state(data)
     program_state = server_state.get("ProgramState", None)
     if program_state is not None:
-        message = "Server state : " + program_state
+        message = f"Server state : {program_state}"
         common.log_output(message, True)
 
     server_activity, backup_id = fetch_progress_state(data)
     message = "Server status: "
     if server_activity.get("OverallProgress", 1) != 1:
         message += server_activity.get("Phase", None)
-        message += " on backup " + backup_id
+        message += f" on backup {backup_id}"
     else:
         message += "Idle"
     common.log_output(message, True)
 
-    message = "Config file  : " + config.CONFIG_FILE
+    message = f"Config file  : {config.CONFIG_FILE}"
     common.log_output(message, True)
 
     if data.get("parameters_file", None) is not None:
         param_file = data.get("parameters_file", "")
-        message = "Params file  : " + param_file
+        message = f"Params file  : {param_file}"
         common.log_output(message, True)
 
     token = data.get("token", None)
@@ -1129,17 +1138,17 @@ def display_status(data):
 
     if data.get("last_login", None) is not None:
         last_login = data.get("last_login", "")
-        message = "Logged in    : " + helper.format_time(data, last_login)
+        message = f"Logged in    : {helper.format_time(data, last_login)}"
         common.log_output(message, True)
 
     if token_expires is not None:
-        message = "Expiration   : " + helper.format_time(data, token_expires)
+        message = f"Expiration   : {helper.format_time(data, token_expires)}"
         common.log_output(message, True)
 
 
 # Pause
 def pause(data, duration):
-    url = "/api/v1/serverstate/pause?duration=" + duration
+    url = f"/api/v1/serverstate/pause?duration={duration}"
     fail_message = "Failed to pause server"
     success_message = "Server paused"
     call_backup_subcommand(data, url, fail_message, success_message)
@@ -1153,24 +1162,55 @@ def resume(data):
 
 # Load the configration from disk
 def load_config(data, overwrite=False):
-    # If the config file doesn't exist, create it
-    if os.path.isfile(config.CONFIG_FILE) is False or overwrite is True:
+    # Replace the config file if requested
+    if overwrite is True:
         common.log_output("Creating config file", True)
         common.write_config(data)
-    # Load the configuration from the config file
-    with io.open(config.CONFIG_FILE, 'r', encoding="UTF-8") as file:
-        try:
-            data = yaml.safe_load(file)
-            common.validate_config(data)
+        return data
+    # Load the configuration from the config file, or create it if missing
+    try:
+        loaded_data = common.read_config()
+    except FileNotFoundError:
+        loaded_data = load_legacy_config()
+        if loaded_data is None:
+            common.log_output("Creating config file", True)
+            common.write_config(data)
             return data
+    except ValueError as exc:
+        common.log_output(exc, True)
+        sys.exit(2)
+
+    common.validate_config(loaded_data)
+    common.persisted_expiration = loaded_data.get("token_expires", None)
+    return loaded_data
+
+
+# Convert the YAML config file of older versions to JSON
+def load_legacy_config():
+    legacy_file = common.get_legacy_config_location()
+    try:
+        file = io.open(legacy_file, 'rb')
+    except FileNotFoundError:
+        return None
+
+    import yaml
+    with file:
+        try:
+            data = common.load_yaml(file.read())
         except yaml.YAMLError as exc:
             common.log_output(exc, True)
             sys.exit(2)
 
+    common.validate_config(data)
+    common.write_config(data)
+    message = f"Converted {legacy_file} to {config.CONFIG_FILE}"
+    common.log_output(message, False)
+    return data
+
 
 # Print the config to stdout
 def display_config(data):
-    common.log_output(yaml.dump(data, default_flow_style=False), True)
+    common.log_output(common.dump_yaml(data), True)
 
 
 # Set parameters file
@@ -1196,10 +1236,15 @@ def display_parameters(data):
     file = data.get("parameters_file", None)
     if file is None:
         return
-    with io.open(file, 'r', encoding="UTF-8") as file_handle:
+    try:
+        file_handle = io.open(file, 'rb')
+    except OSError:
+        common.log_output("Could not load parameters file", True)
+        return
+    with file_handle:
         try:
-            parameters_file = yaml.safe_load(file_handle)
-            output = yaml.dump(parameters_file, default_flow_style=False)
+            parameters_file = common.load_yaml(file_handle.read())
+            output = common.dump_yaml(parameters_file)
             common.log_output(output, True)
             return
         except Exception:
@@ -1216,24 +1261,27 @@ def import_resource(data, resource, import_file, backup_id, import_meta=None):
 
 # Import backup configuration from a YAML or JSON file
 def import_backup(data, import_file, backup_id=None, import_meta=None):
-    # Don't load nonexisting files
-    if os.path.isfile(import_file) is False:
-        common.log_output(import_file + " not found", True)
-        return
+    import yaml
 
-    # Load the import file
-    with io.open(import_file, 'r', encoding="UTF-8") as file_handle:
+    # Load the import file, skipping nonexisting files
+    try:
+        file_handle = io.open(import_file, 'rb')
+    except FileNotFoundError:
+        common.log_output(f"{import_file} not found", True)
+        return
+    with file_handle:
+        content = file_handle.read()
         extension = splitext(import_file)[1]
         if extension.lower() in ['.yml', '.yaml']:
             try:
-                backup_config = yaml.safe_load(file_handle)
+                backup_config = common.load_yaml(content)
             except yaml.YAMLError:
                 common.log_output("Failed to load file as YAML", True)
                 return
 
         elif extension.lower() == ".json":
             try:
-                backup_config = json.load(file_handle)
+                backup_config = orjson.loads(content)
             except Exception:
                 common.log_output("Failed to load file as JSON", True)
                 return
@@ -1248,10 +1296,12 @@ def import_backup(data, import_file, backup_id=None, import_meta=None):
     if import_meta is None or import_meta is not True:
         backup_config["Backup"]["Metadata"] = {}
 
-    # Prepare the imported JSON object as a string
-    backup_config = json.dumps(backup_config, default=str)
+    # Prepare the imported JSON object as bytes
+    # YAML files may have non-string keys, which json.dumps used to convert
+    backup_config = orjson.dumps(backup_config, default=str,
+                                 option=orjson.OPT_NON_STR_KEYS)
 
-    # Upload our JSON string as a file with requests
+    # Upload our JSON bytes as a file with requests
     files = {
         'config': ('backup_config.json', backup_config, 'application/json')
     }
@@ -1263,11 +1313,8 @@ def import_backup(data, import_file, backup_id=None, import_meta=None):
         'import_metadata': import_meta,
         'direct': True
     }
-    cookies = common.create_cookies(data)
     baseurl = common.create_baseurl(data, "/api/v1/backups/import", True)
-    verify = data.get("server", {}).get("verify", True)
-    r = requests.post(baseurl, files=files, cookies=cookies, data=payload,
-                      verify=verify)
+    r = requests.post(baseurl, files=files, data=payload)
     common.check_response(data, r.status_code)
     # Code for extracting error messages posted with inline javascript
     # and with 200 OK http status code, preventing us from detecting
@@ -1300,15 +1347,32 @@ def export_backup(data, backup_id, output=None, path=None, export_passwords=True
     else:
         create_backup_export(data, backup_id, output, path, export_passwords, timestamp)
 
+
+# Write an exported backup configuration as JSON
+def write_json_export(backup, file):
+    options = orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE
+    file.write(orjson.dumps(backup, default=str, option=options))
+
+
+# Write an exported backup configuration as YAML
+def write_yaml_export(backup, file):
+    common.dump_yaml(backup, file, encoding="UTF-8")
+
+
+# File extension and writer for each export format
+EXPORT_FORMATS = {
+    "json": (".json", write_json_export),
+    "yaml": (".yml", write_yaml_export)
+}
+
+
 # Export backup configuration to either YAML or JSON
 def create_backup_export(data, backup_id, output, path, export_passwords, timestamp):
-    baseurl = common.create_baseurl(data, "/api/v1/backup/" + str(backup_id)
-                                    + "/export?export-passwords=" + str(export_passwords).lower())
+    endpoint = f"/api/v1/backup/{backup_id}/export"
+    endpoint += f"?export-passwords={str(export_passwords).lower()}"
+    baseurl = common.create_baseurl(data, endpoint)
     common.log_output("Fetching backup data from API...", False)
-    cookies = common.create_cookies(data)
-    headers = common.create_headers(data)
-    verify = data.get("server", {}).get("verify", True)
-    r = requests.get(baseurl, headers=headers, cookies=cookies, verify=verify)
+    r = requests.get(baseurl)
     common.check_response(data, r.status_code)
     if r.status_code == 404:
         common.log_output("Backup not found", True, r.status_code)
@@ -1317,45 +1381,48 @@ def create_backup_export(data, backup_id, output, path, export_passwords, timest
         common.log_output("Error connecting", True, r.status_code)
         sys.exit(2)
 
-    backup = r.json()
+    backup = orjson.loads(r.content)
     name = backup['Backup']['Name']
 
     # YAML or JSON?
-    if output in ["YAML", "yaml"]:
-        filetype = ".yml"
-    else:
-        filetype = ".json"
+    output = "json" if output is None else str(output).lower()
+    # Unknown formats, e.g. from a parameters file, fall back to JSON
+    filetype, write_export = EXPORT_FORMATS.get(output,
+                                                EXPORT_FORMATS["json"])
 
     # Decide on where to output file
     if timestamp:
         stamp = datetime.datetime.now().strftime("%d.%m.%Y_%I.%M_%p")
-        file_name = name + "_" + str(stamp) + filetype
+        file_name = f"{name}_{stamp}{filetype}"
     else:
-        file_name = name + filetype
+        file_name = f"{name}{filetype}"
 
     if path is None:
         path = file_name
     else:
         path = common.ensure_trailing_slash(path)
-        path = os.path.dirname(expanduser(path)) + "/" + file_name
+        path = f"{os.path.dirname(expanduser(path))}/{file_name}"
 
-    # Check if output folder exists
+    # Create the output folder if it doesn't exist
     directory = os.path.dirname(path)
-    if directory != '' and not os.path.exists(directory):
-        message = "Created directory \"" + directory + "\""
-        common.log_output(message, True)
-        os.makedirs(directory)
-    # Check if output file exists
-    if os.path.isfile(path) is True:
+    if directory != '':
+        try:
+            os.makedirs(directory)
+            message = f"Created directory \"{directory}\""
+            common.log_output(message, True)
+        except FileExistsError:
+            pass
+    # Ask before overwriting an existing output file
+    try:
+        file = io.open(path, 'xb')
+    except FileExistsError:
         agree = input('File already exists, overwrite? [Y/n]:')
         if agree not in ["Y", "y", "yes", "YES", ""]:
             return
-    with io.open(path, 'w', encoding="UTF-8") as file:
-        if filetype == ".json":
-            file.write(json.dumps(backup, indent=4, default=str))
-        else:
-            file.write(yaml.dump(backup, default_flow_style=False))
-    common.log_output("Created " + path, True, 200)
+        file = io.open(path, 'wb')
+    with file:
+        write_export(backup, file)
+    common.log_output(f"Created {path}", True, 200)
 
 
 # argparse argument logic
@@ -1364,8 +1431,10 @@ if __name__ == '__main__':
         common.log_output(common.info(), True)
         sys.exit(2)
 
-    # Initialize argument parser and standard optional arguments
-    parser = ArgumentParser.parser
+    # Only build the subparser of the requested command when possible
+    command = next((arg for arg in sys.argv[1:]
+                    if not arg.startswith("-")), None)
+    parser = ArgumentParser.create_parser(command)
 
     # Construct parsers and initialize the main method
     args = parser.parse_args()
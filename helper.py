@@ -2,8 +2,8 @@
 import common
 import datetime
 
-from dateutil import parser as dateparser
-from dateutil import tz
+# Shared UTC timezone, the stdlib singleton needs no construction per call
+UTC = datetime.timezone.utc
 
 
 # Helper function for formatting timestamps for humans
@@ -18,7 +18,7 @@ def format_time(data, time_string):
 
     # We want to fail silently if we're not provided a parsable time_string.
     try:
-        datetime_object = dateparser.parse(time_string)
+        datetime_object = parse_time(time_string)
     except Exception as exc:
         common.log_output(exc, False)
         return None
@@ -28,8 +28,8 @@ def format_time(data, time_string):
         return datetime_object.strftime("%I:%M:%S %p %d/%m/%Y")
 
     # Now for comparison
-    now = datetime.datetime.now().replace(tzinfo=tz.tzutc())
-    datetime_object = datetime_object.replace(tzinfo=tz.tzutc())
+    now = datetime.datetime.now().replace(tzinfo=UTC)
+    datetime_object = datetime_object.replace(tzinfo=UTC)
 
     # Get the delta
     if datetime_object > now:
@@ -41,47 +41,61 @@ def format_time(data, time_string):
     if abs(delta.days) > 1:
         return datetime_object.strftime("%d/%m/%Y")
     elif delta.days == 1:
-        return "Yesterday " + datetime_object.strftime("%I:%M %p")
+        return f"Yesterday {datetime_object:%I:%M %p}"
     elif delta.days == -1:
-        return "Tomorrow " + datetime_object.strftime("%I:%M %p")
+        return f"Tomorrow {datetime_object:%I:%M %p}"
     else:
         return datetime_object.strftime("%I:%M %p")
 
 
+# Helper function for parsing timestamps
+# The server sends ISO 8601, so try the fast parser before dateutil
+def parse_time(time_string):
+    try:
+        iso_string = time_string.replace("Z", "+00:00")
+        return datetime.datetime.fromisoformat(iso_string)
+    except ValueError:
+        from dateutil import parser as dateparser
+        return dateparser.parse(time_string)
+
+
+# Helper function for splitting text into at most max_lines lines
+def limit_lines(text, max_lines=15, show_all=False):
+    line_count = text.count("\n") + 1
+    if show_all or line_count <= max_lines:
+        return text.split("\n")
+
+    # Only split the part of the text that is displayed
+    end = -1
+    for _ in range(max_lines):
+        end = text.find("\n", end + 1)
+    lines = text[:end].split("\n")
+    hidden_lines = line_count - max_lines
+    lines.append(f"{hidden_lines} hidden lines (show with --all)")
+    return lines
+
+
 # Helper function for formatting time deltas for humans
 def format_duration(duration_string):
     duration = duration_string.split(".")[0]
     return duration
 
 
+# Units for human readable sizes, each 1024 times the previous
+BYTE_UNITS = ('bytes', 'KB', 'MB', 'GB', 'TB')
+
+
 # Helper function for human readable bit sizes
-# Source https://stackoverflow.com/questions/12523586/
+# Every unit is 10 bits larger, so the bit length picks the unit directly
 def format_bytes(number_of_bytes):
     if number_of_bytes < 0:
         raise ValueError("!!! numberOfBytes can't be smaller than 0 !!!")
 
-    step_to_greater_unit = 1024.
-
-    number_of_bytes = float(number_of_bytes)
-    unit = 'bytes'
-
-    if (number_of_bytes / step_to_greater_unit) >= 1:
-        number_of_bytes /= step_to_greater_unit
-        unit = 'KB'
-
-    if (number_of_bytes / step_to_greater_unit) >= 1:
-        number_of_bytes /= step_to_greater_unit
-        unit = 'MB'
-
-    if (number_of_bytes / step_to_greater_unit) >= 1:
-        number_of_bytes /= step_to_greater_unit
-        unit = 'GB'
-
-    if (number_of_bytes / step_to_greater_unit) >= 1:
-        number_of_bytes /= step_to_greater_unit
-        unit = 'TB'
-
-    precision = 2
-    number_of_bytes = round(number_of_bytes, precision)
+    unit = (int(number_of_bytes).bit_length() - 1) // 10
+    if unit < 0:
+        unit = 0
+    elif unit > 4:
+        unit = 4
+    number_of_bytes = round(number_of_bytes / (1 << (unit * 10)), 2)
 
-    return str(number_of_bytes) + ' ' + unit
+    return f"{number_of_bytes} {BYTE_UNITS[unit]}"
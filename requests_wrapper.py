@@ -5,15 +5,142 @@
 # import the library instead of requests
 # from requests_wrapper import requests_wrapper as requests
 # use it like the requests library
-import requests
-import urllib3
-
-# Disable invalid SSL warnings when explicitly asking to not check
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+import hashlib
+import json
+import os
+import threading
 
 # To avoid hanging forever on requests
 timeout_seconds=5
 
+# Shared session so connections are pooled and kept alive between calls
+# It is created on first use so that importing this module stays cheap
+session = None
+
+# Headers, cookies and certificate validation used on the shared session
+# Validation is passed on every request too, since requests lets the
+# REQUESTS_CA_BUNDLE and CURL_CA_BUNDLE variables override a session's value
+session_headers = {}
+session_cookies = {}
+session_verify = True
+
+
+# Create the shared session the first time it's needed
+def get_session():
+    global session
+    if session is not None:
+        return session
+
+    import requests
+    import urllib3
+
+    from requests.adapters import HTTPAdapter
+
+    # Disable invalid SSL warnings when explicitly asking to not check
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(session_headers)
+    session.cookies.update(session_cookies)
+    session.verify = session_verify
+    return session
+
+
+# Replace the headers, cookies and certificate validation for every request
+def set_auth(headers, cookies, verify=True):
+    global session_verify
+    if session is not None:
+        for key in session_headers:
+            session.headers.pop(key, None)
+        session.headers.update(headers)
+        # Drop cookies the server set, they would be sent next to these
+        session.cookies.clear()
+        session.cookies.update(cookies)
+        session.verify = verify
+    session_verify = verify
+    session_headers.clear()
+    session_headers.update(headers)
+    session_cookies.clear()
+    session_cookies.update(cookies)
+
+
+# Forget the cookies the server set on the shared session
+# Requests given explicit cookies would otherwise send both sets
+def clear_cookies():
+    if session is not None:
+        session.cookies.clear()
+
+
+# Directory for caching GET responses between invocations, None disables it
+cache_directory = None
+cache = None
+cache_lock = threading.Lock()
+
+# Whether responses are read from and stored in the cache
+# Changes to the server clear the cache regardless
+use_cache = True
+
+# Missing and failing resources are remembered a bit longer to spare the
+# server from scripts probing the same ids over and over
+negative_statuses = {404, 500}
+negative_cache_seconds = 30
+
+
+# Open the disk cache the first time it's needed
+# Cached responses can hold backup credentials, so only the user may read them
+# The first call can come from several threads fetching backups at once
+def get_cache():
+    global cache
+    if cache is not None or cache_directory is None:
+        return cache
+    with cache_lock:
+        if cache is not None:
+            return cache
+        import diskcache
+        os.makedirs(cache_directory, mode=0o700, exist_ok=True)
+        os.chmod(cache_directory, 0o700)
+        # SQLite gives the -wal and -shm files the mode of the database
+        database = os.path.join(cache_directory, diskcache.core.DBNAME)
+        os.close(os.open(database, os.O_WRONLY | os.O_CREAT, 0o600))
+        os.chmod(database, 0o600)
+        # Drop expired responses right away instead of in a later cull,
+        # and overwrite their content when deleted
+        new_cache = diskcache.Cache(cache_directory, sqlite_secure_delete=1)
+        new_cache.expire()
+        cache = new_cache
+    return cache
+
+
+# Key cached responses on the url, the parameters, and the credentials
+def create_cache_key(baseurl, params):
+    credentials = repr(sorted(session_cookies.items())).encode()
+    return (baseurl, repr(sorted((params or {}).items())),
+            hashlib.sha256(credentials).hexdigest())
+
+
+# Forget all cached responses, e.g. after the server state was changed
+# A cache left by earlier invocations is cleared even if it isn't being used
+def clear_cache():
+    if cache is None and (cache_directory is None or
+                          not os.path.isdir(cache_directory)):
+        return
+    get_cache().clear()
+
+
+# Cached return object standing in for a response
+class Cached():
+    def __init__(self, status_code, content, url):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+
+    def json(self):
+        return json.loads(self.content)
+
+
 # Dummy return object for when exceptions are thrown
 class Dummy():
     status_code = 503
@@ -27,18 +154,35 @@ class requests_wrapper():
             cookies=None,
             params=None,
             allow_redirects=True,
-            verify=True,
-            timeout=timeout_seconds
+            verify=None,
+            timeout=timeout_seconds,
+            cache_seconds=0
            ):
+        import requests
+        # Serve recent responses from the disk cache if allowed
+        key = None
+        if cache_seconds > 0 and use_cache and get_cache() is not None:
+            key = create_cache_key(baseurl, params)
+            cached = cache.get(key, None)
+            if cached is not None:
+                return Cached(*cached)
+        if verify is None:
+            verify = session_verify
         try:
-            r = requests.get(baseurl,
-                             headers=headers,
-                             cookies=cookies,
-                             params=params,
-                             allow_redirects=allow_redirects,
-                             verify=verify,
-                             timeout=timeout_seconds
-                            )
+            r = get_session().get(baseurl,
+                                  headers=headers,
+                                  cookies=cookies,
+                                  params=params,
+                                  allow_redirects=allow_redirects,
+                                  verify=verify,
+                                  timeout=timeout_seconds
+                                 )
+            if key is not None and r.status_code == 200:
+                cache.set(key, (r.status_code, r.content, r.url),
+                          expire=cache_seconds)
+            elif key is not None and r.status_code in negative_statuses:
+                cache.set(key, (r.status_code, r.content[:512], r.url),
+                          expire=negative_cache_seconds)
             return r
         except requests.exceptions.SSLError:
             dummy = Dummy()
@@ -64,18 +208,23 @@ class requests_wrapper():
                cookies=None,
                params=None,
                allow_redirects=True,
-               verify=True,
+               verify=None,
                timeout=timeout_seconds
               ):
+        import requests
+        # The server state is about to change, drop cached responses
+        clear_cache()
+        if verify is None:
+            verify = session_verify
         try:
-            r = requests.delete(baseurl,
-                                headers=headers,
-                                cookies=cookies,
-                                params=params,
-                                allow_redirects=allow_redirects,
-                                verify=verify,
-                                timeout=timeout_seconds
-                                )
+            r = get_session().delete(baseurl,
+                                     headers=headers,
+                                     cookies=cookies,
+                                     params=params,
+                                     allow_redirects=allow_redirects,
+                                     verify=verify,
+                                     timeout=timeout_seconds
+                                     )
             return r
         except requests.exceptions.SSLError:
             dummy = Dummy()
@@ -99,20 +248,25 @@ class requests_wrapper():
              data=None,
              files=None,
              allow_redirects=True,
-             verify=True,
+             verify=None,
              timeout=timeout_seconds
             ):
+        import requests
+        # The server state is about to change, drop cached responses
+        clear_cache()
+        if verify is None:
+            verify = session_verify
         try:
-            r = requests.post(baseurl,
-                              headers=headers,
-                              cookies=cookies,
-                              params=params,
-                              data=data,
-                              files=files,
-                              allow_redirects=allow_redirects,
-                              verify=verify,
-                              timeout=timeout_seconds
-                             )
+            r = get_session().post(baseurl,
+                                   headers=headers,
+                                   cookies=cookies,
+                                   params=params,
+                                   data=data,
+                                   files=files,
+                                   allow_redirects=allow_redirects,
+                                   verify=verify,
+                                   timeout=timeout_seconds
+                                  )
             return r
         except requests.exceptions.SSLError:
             dummy = Dummy()
@@ -136,20 +290,25 @@ class requests_wrapper():
             data=None,
             files=None,
             allow_redirects=True,
-            verify=True,
+            verify=None,
             timeout=timeout_seconds
            ):
+        import requests
+        # The server state is about to change, drop cached responses
+        clear_cache()
+        if verify is None:
+            verify = session_verify
         try:
-            r = requests.put(baseurl,
-                             headers=headers,
-                             cookies=cookies,
-                             params=params,
-                             data=data,
-                             files=files,
-                             allow_redirects=allow_redirects,
-                             verify=verify,
-                             timeout=timeout_seconds
-                            )
+            r = get_session().put(baseurl,
+                                  headers=headers,
+                                  cookies=cookies,
+                                  params=params,
+                                  data=data,
+                                  files=files,
+                                  allow_redirects=allow_redirects,
+                                  verify=verify,
+                                  timeout=timeout_seconds
+                                 )
             return r
         except requests.exceptions.SSLError:
             dummy = Dummy()
@@ -173,20 +332,25 @@ class requests_wrapper():
               data=None,
               files=None,
               allow_redirects=True,
-              verify=True,
+              verify=None,
               timeout=timeout_seconds
              ):
+        import requests
+        # The server state is about to change, drop cached responses
+        clear_cache()
+        if verify is None:
+            verify = session_verify
         try:
-            r = requests.patch(baseurl,
-                               headers=headers,
-                               cookies=cookies,
-                               params=params,
-                               data=data,
-                               files=files,
-                               allow_redirects=allow_redirects,
-                               verify=verify,
-                               timeout=timeout_seconds
-                              )
+            r = get_session().patch(baseurl,
+                                    headers=headers,
+                                    cookies=cookies,
+                                    params=params,
+                                    data=data,
+                                    files=files,
+                                    allow_redirects=allow_redirects,
+                                    verify=verify,
+                                    timeout=timeout_seconds
+                                   )
             return r
         except requests.exceptions.SSLError:
             dummy = Dummy()
@@ -1,8 +1,18 @@
+import datetime
+import http.server
+import orjson
+import os
+import tempfile
+import threading
+import time
 import unittest
 from mock import patch
 from auth import login
 import common
+import config
+import duplicati_client
 import requests
+import requests_wrapper
 
 
 class TestLogin(unittest.TestCase):
@@ -83,6 +93,7 @@ class TestLogin(unittest.TestCase):
                 self.url = url
                 self.cookies = cookies
                 self.json_raw = json_raw
+                self.content = orjson.dumps(json_raw)
 
             def json(self):
                 return self.json_raw
@@ -115,7 +126,8 @@ class TestLogin(unittest.TestCase):
                     'Salt': 'H9euyRJMYftnoDGro2TC4tEMsQ/BCpZ5dVSBRN1cDC4='}
             return MockResponse(200, headers, args[0], cookies, json)
 
-    @patch('requests.get', side_effect=mock_requests_get)
+    @patch('requests_wrapper.requests_wrapper.get',
+           side_effect=mock_requests_get)
     @patch('common.write_config', side_effect=mock_write_config)
     def test_integrated_auth_logged_in(self, mock_requests_get,
                                        mock_write_config):
@@ -142,9 +154,11 @@ class TestLogin(unittest.TestCase):
         finally:
             pass
 
-    @patch('requests.get', side_effect=mock_requests_get_redirect)
+    @patch('requests_wrapper.requests_wrapper.get',
+           side_effect=mock_requests_get_redirect)
     @patch('common.write_config', side_effect=mock_write_config)
-    @patch('requests.post', side_effect=mock_requests_post)
+    @patch('requests_wrapper.requests_wrapper.post',
+           side_effect=mock_requests_post)
     def test_integrated_auth_not_logged_in(self, mock_requests_get,
                                            mock_write_config,
                                            mock_requests_post
@@ -173,9 +187,11 @@ class TestLogin(unittest.TestCase):
         finally:
             pass
 
-    @patch('requests.get', side_effect=mock_requests_get)
+    @patch('requests_wrapper.requests_wrapper.get',
+           side_effect=mock_requests_get)
     @patch('common.write_config', side_effect=mock_write_config)
-    @patch('requests.post', side_effect=mock_requests_post)
+    @patch('requests_wrapper.requests_wrapper.post',
+           side_effect=mock_requests_post)
     def test_basic_auth_not_logged_in(self, mock_requests_get,
                                       mock_write_config,
                                       mock_requests_post
@@ -205,6 +221,104 @@ class TestLogin(unittest.TestCase):
         finally:
             pass
 
+    @patch('requests_wrapper.requests_wrapper.get',
+           side_effect=mock_requests_get)
+    @patch('common.write_config', side_effect=mock_write_config)
+    def test_login_url_parsing(self, mock_requests_get, mock_write_config):
+        """This test case validates that a url without a protocol
+           is split into url and port"""
+        data = {
+            "last_login": None,
+            "parameters_file": None,
+            "server": {
+                "port": "",
+                "protocol": "http",
+                "url": "",
+                "verify": True
+                },
+            'token': None,
+            'token_expires': None,
+            'verbose': False,
+            'authorization': ''
+            }
+        login(data, input_url="localhost:8200", password=None, verify=True,
+              interactive=True, basic_user=None, basic_pass=None)
+        self.assertEqual(data["server"]["protocol"], "http")
+        self.assertEqual(data["server"]["url"], "localhost")
+        self.assertEqual(data["server"]["port"], "8200")
+
+
+class TestLoginCookies(unittest.TestCase):
+    # Local server asking for a password login, recording sent cookies
+    def setUp(self):
+        cookies = self.cookies = {}
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def respond(self, body, set_cookies):
+                self.send_response(200)
+                for cookie in set_cookies:
+                    self.send_header("Set-Cookie", cookie)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path != "/login.html":
+                    self.send_response(302)
+                    self.send_header("Location", "/login.html")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.respond(b"", ["xsrf-token=ab%2Bcd"])
+
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                body = self.rfile.read(length)
+                if body == b"get-nonce=1":
+                    cookies["nonce"] = self.headers.get("Cookie", None)
+                    nonce = "rK44ZOGiWJKk+aDluN/b60MlwXGbQcRc9SnuxSHv784="
+                    salt = "H9euyRJMYftnoDGro2TC4tEMsQ/BCpZ5dVSBRN1cDC4="
+                    content = orjson.dumps({"Nonce": nonce, "Salt": salt})
+                    self.respond(content, ["xsrf-token=ef%2Bgh",
+                                           "session-nonce=rK44%3D"])
+                else:
+                    cookies["password"] = self.headers.get("Cookie", None)
+                    self.respond(b"", ["session-auth=ij%2Bkl"])
+
+        self.server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  kwargs={"poll_interval": 0.05})
+        thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        requests_wrapper.set_auth({}, {})
+        requests_wrapper.session = None
+
+    @patch('common.write_config')
+    def test_login_cookies_sent_once(self, write_config):
+        data = {
+            "server": {
+                "port": str(self.server.server_port),
+                "protocol": "http",
+                "url": "127.0.0.1",
+                "verify": True
+                },
+            'token': None,
+            'token_expires': None,
+            'authorization': ''
+            }
+        login(data, password='1234', interactive=False)
+        self.assertIsNone(self.cookies["nonce"])
+        nonce = "rK44ZOGiWJKk+aDluN/b60MlwXGbQcRc9SnuxSHv784="
+        self.assertEqual(self.cookies["password"],
+                         f"xsrf-token=ef+gh; session-nonce={nonce}")
+        self.assertEqual(data["session-auth"], "ij+kl")
+
 
 class TestResponse(unittest.TestCase):
     def setUp(self):
@@ -278,3 +392,224 @@ class TestResponse200(unittest.TestCase):
             'authorization': ''
             }
         common.check_response(data, 200)
+
+
+class TestConfigFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config_file = config.CONFIG_FILE
+        config.CONFIG_FILE = os.path.join(self.directory.name, "config.json")
+        self.reset_write_state()
+
+    def tearDown(self):
+        self.reset_write_state()
+        config.CONFIG_FILE = self.config_file
+        self.directory.cleanup()
+
+    # Forget earlier writes so they don't leak between tests
+    def reset_write_state(self):
+        common.persisted_expiration = None
+        common.pending_config = None
+        common.last_config_write = None
+
+    def create_data(self, token_expires):
+        return {
+            "server": {
+                "port": "8200",
+                "protocol": "http",
+                "url": "localhost",
+                "verify": True
+                },
+            'token': "token",
+            'token_expires': token_expires,
+            }
+
+    def test_config_round_trip(self):
+        data = {
+            "last_login": datetime.datetime(2018, 6, 13, 20, 45, 29),
+            "server": {
+                "port": "8200",
+                "protocol": "http",
+                "url": "localhost",
+                "verify": True
+                },
+            'token': "token",
+            'token_expires': datetime.datetime(2018, 6, 13, 20, 55, 29),
+            }
+        common.write_config(data)
+        self.assertEqual(common.read_config(), data)
+
+    def test_legacy_config_converted(self):
+        with open(common.get_legacy_config_location(), 'w') as file:
+            file.write("server:\n"
+                       "  port: '8200'\n"
+                       "  protocol: http\n"
+                       "  url: localhost\n"
+                       "token: token\n"
+                       "token_expires: 2018-06-13 20:55:29\n")
+        data = duplicati_client.load_config({})
+        self.assertEqual(data["token_expires"],
+                         datetime.datetime(2018, 6, 13, 20, 55, 29))
+        self.assertEqual(common.read_config(), data)
+
+    def test_small_refresh_deferred(self):
+        written = datetime.datetime.now() + datetime.timedelta(0, 600)
+        data = self.create_data(written)
+        common.write_config(data)
+        common.check_response(data, 200)
+        self.assertIs(common.pending_config, data)
+        self.assertEqual(common.read_config()["token_expires"], written)
+
+        common.flush_config()
+        self.assertIsNone(common.pending_config)
+        self.assertEqual(common.read_config()["token_expires"],
+                         data["token_expires"])
+
+    def test_large_refresh_written(self):
+        written = datetime.datetime.now()
+        data = self.create_data(written)
+        common.write_config(data)
+        common.check_response(data, 200)
+        self.assertIsNone(common.pending_config)
+        self.assertEqual(common.read_config()["token_expires"],
+                         data["token_expires"])
+
+    def test_identical_config_written_once(self):
+        data = self.create_data(datetime.datetime(2018, 6, 13, 20, 55, 29))
+        with patch('os.replace', wraps=os.replace) as replace:
+            common.write_config(data)
+            common.write_config(dict(data))
+        self.assertEqual(replace.call_count, 1)
+
+
+class TestResponseCache(unittest.TestCase):
+    # Globals changed by the cache or by running main
+    GLOBALS = [
+        (config, ["CONFIG_FILE", "VERBOSE", "OUTPUT_FORMAT"]),
+        (common, ["log_output", "persisted_expiration", "pending_config",
+                  "last_config_write"]),
+        (requests_wrapper, ["cache_directory", "cache", "use_cache",
+                            "session", "session_verify"])
+    ]
+
+    def setUp(self):
+        self.saved = [(module, name, getattr(module, name))
+                      for module, names in self.GLOBALS for name in names]
+        self.session_headers = dict(requests_wrapper.session_headers)
+        self.session_cookies = dict(requests_wrapper.session_cookies)
+        self.directory = tempfile.TemporaryDirectory()
+        requests_wrapper.cache_directory = os.path.join(self.directory.name,
+                                                        "cache")
+        requests_wrapper.cache = None
+        self.requests = 0
+
+    def tearDown(self):
+        if requests_wrapper.cache is not None:
+            requests_wrapper.cache.close()
+        for module, name, value in self.saved:
+            setattr(module, name, value)
+        requests_wrapper.session_headers.clear()
+        requests_wrapper.session_headers.update(self.session_headers)
+        requests_wrapper.session_cookies.clear()
+        requests_wrapper.session_cookies.update(self.session_cookies)
+        self.directory.cleanup()
+
+    # Stand-in for the shared session, counting the requests that reach it
+    def mock_session(self):
+        class MockResponse:
+            def __init__(self, url, content):
+                self.status_code = 200
+                self.url = url
+                self.content = content
+
+        def request(baseurl, **kwargs):
+            self.requests += 1
+            return MockResponse(baseurl, orjson.dumps([self.requests]))
+
+        class MockSession:
+            get = post = put = patch = delete = staticmethod(request)
+        return MockSession()
+
+    def get(self, cache_seconds=5):
+        url = "http://localhost:8200/api/v1/backups"
+        with patch('requests_wrapper.get_session', self.mock_session):
+            r = requests_wrapper.requests_wrapper.get(
+                url, cache_seconds=cache_seconds)
+        return orjson.loads(r.content)
+
+    def test_cache_hit(self):
+        self.assertEqual(self.get(), [1])
+        self.assertEqual(self.get(), [1])
+        self.assertEqual(self.requests, 1)
+
+    def test_cache_expiry(self):
+        self.assertEqual(self.get(cache_seconds=0.1), [1])
+        time.sleep(0.2)
+        self.assertEqual(self.get(cache_seconds=0.1), [2])
+
+    def test_cache_cleared_on_changes(self):
+        url = "http://localhost:8200/api/v1/backup/1"
+        wrapper = requests_wrapper.requests_wrapper
+        for method in [wrapper.post, wrapper.put, wrapper.patch,
+                       wrapper.delete]:
+            expected = self.requests + 1
+            self.assertEqual(self.get(), [expected])
+            self.assertEqual(self.get(), [expected])
+            with patch('requests_wrapper.get_session', self.mock_session):
+                method(url)
+        expected = self.requests + 1
+        self.assertEqual(self.get(), [expected])
+
+    def test_cache_private(self):
+        self.get()
+        directory = requests_wrapper.cache_directory
+        self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
+        for name in os.listdir(directory):
+            mode = os.stat(os.path.join(directory, name)).st_mode & 0o777
+            self.assertEqual(mode & 0o077, 0, name)
+
+    def test_cache_cleared_without_use(self):
+        self.assertEqual(self.get(), [1])
+        requests_wrapper.use_cache = False
+        with patch('requests_wrapper.get_session', self.mock_session):
+            requests_wrapper.requests_wrapper.post(
+                "http://localhost:8200/api/v1/backup/1/run")
+        requests_wrapper.use_cache = True
+        self.assertEqual(self.get(), [3])
+
+    def test_expired_removed_on_open(self):
+        self.get(cache_seconds=0.1)
+        time.sleep(0.2)
+        requests_wrapper.cache.close()
+        requests_wrapper.cache = None
+        cache = requests_wrapper.get_cache()
+        self.assertEqual(list(cache.iterkeys()), [])
+
+    def test_cache_opened_once(self):
+        start = threading.Barrier(8)
+
+        def open_cache():
+            start.wait()
+            return requests_wrapper.get_cache()
+        threads = []
+        caches = []
+        for _ in range(8):
+            thread = threading.Thread(
+                target=lambda: caches.append(open_cache()))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(caches), 8)
+        self.assertTrue(all(cache is caches[0] for cache in caches))
+
+    def test_no_cache(self):
+        config_file = os.path.join(self.directory.name, "config.json")
+        with patch('compatibility.get_config_location',
+                   return_value=config_file), \
+                patch.dict('duplicati_client.COMMANDS',
+                           {"status": lambda data, args: None}):
+            duplicati_client.main(method="status", no_cache=True)
+        self.assertFalse(requests_wrapper.use_cache)
+        self.assertEqual(self.get(), [1])
+        self.assertEqual(self.get(), [2])